@@ -6,9 +6,82 @@ import os
 import re
 import sys
 import json
+import functools
+import pandas
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 from sirius import Sirius, SiriusConfig
 
+# define module folder
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# define patterns
+_PROJECT_NAME_RE = re.compile(r"[^a-zA-Z0-9_-]")
+_ELEMENT_RE = re.compile(r"([A-Z][a-z]*)(\d*)")
+_INVALID_ADDUCT_RE = re.compile(r"2M|\+2|\+3|-2|-3|MeOH|ACN|-e|\+e")
+
+# define constants
+_PROTON_MASS = 1.00727663
+_BUFFER_SIZE = 1 << 20
+
+# define levels to be shown immediately
+_FLUSH_LEVELS = ("TEMP", "PROGRESS", "WARNING", "ERROR")
+
+
+def _read_json(path):
+    """Reads JSON file using orjson if available."""
+    
+    if orjson is None:
+        with open(path) as f:
+            return json.load(f)
+    
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+@functools.lru_cache(maxsize=1)
+def _load_settings():
+    """Loads main settings from JSON."""
+    
+    path = os.path.join(_MODULE_DIR, "settings.json")
+    return _read_json(path)
+
+
+def _iter_json_items(path):
+    """Iterates items of JSON array file, streaming via ijson if available."""
+    
+    if ijson is None:
+        yield from _read_json(path)
+        return
+    
+    with open(path, 'rb', buffering=0) as f:
+        yield from ijson.items(f, 'item', use_float=True, buf_size=_BUFFER_SIZE)
+
+
+def _build_peaks(masses, intensities):
+    """Builds SIRIUS peaks from masses and intensities."""
+    
+    return [{'mz': mz, 'intensity': ai} for mz, ai in zip(masses, intensities)]
+
+
+def _orjson_default(obj):
+    """Serializes values unsupported by orjson."""
+    
+    # pandas missing values
+    if obj is pandas.NA or obj is pandas.NaT:
+        return None
+    
+    raise TypeError
+
 
 class CDSirius(object):
     """Main CD SIRIUS node implementation."""
@@ -29,7 +102,10 @@ class CDSirius(object):
         
         # show all as standard output
         sys.stdout.write(f"CDS {level}: {message}\n")
-        sys.stdout.flush()
+        
+        # flush buffer for messages displayed by the node
+        if level in _FLUSH_LEVELS:
+            sys.stdout.flush()
     
     
     def run(self):
@@ -48,8 +124,7 @@ class CDSirius(object):
                 project = sirius.init_project()
                 
                 # load features
-                features = self._load_features()
-                sirius.set_features(project, features)
+                sirius.set_features(project, self._load_features())
                 
                 # submit job
                 job = sirius.init_job()
@@ -62,7 +137,7 @@ class CDSirius(object):
             
             except Exception as e:
                 self.log(e, "ERROR")
-                exit(1)
+                raise
             
             # close project
             finally:
@@ -79,14 +154,11 @@ class CDSirius(object):
         self.log("Loading SIRIUS config...", "TEMP")
         
         # load main settings from JSON
-        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.json")
-        with open(path) as f:
-            settings = json.load(f)
+        settings = _load_settings()
         
         # load params from JSON
         config_path = os.path.join(self._workdir, "sirius_config.json")
-        with open(config_path) as f:
-            self._params = json.load(f)
+        self._params = _read_json(config_path)
         
         # make paths absolute
         if not os.path.isabs(self._params["ProjectPath"]):
@@ -113,7 +185,7 @@ class CDSirius(object):
         
         # init project space
         project_name = self._params["ProjectName"]
-        project_name = re.sub(r"[^a-zA-Z0-9_-]", "", project_name)
+        project_name = _PROJECT_NAME_RE.sub("", project_name)
         config.project_name = project_name
         config.project_path = self._params["ProjectPath"]
         
@@ -126,7 +198,7 @@ class CDSirius(object):
         config.formula_id_perform_denovo_below_mz = float(self._params["DeNovoMassThreshold"])
         
         # init elements constraints
-        constraints = re.findall(r"([A-Z][a-z]*)(\d*)?", self._params["ElementalConstraints"])
+        constraints = _ELEMENT_RE.findall(self._params["ElementalConstraints"])
         config.formula_id_enforced_formula_constraints = "".join(f"{e}[{c}]" for e, c in constraints)
         
         # set compound class search
@@ -150,80 +222,77 @@ class CDSirius(object):
     
     
     def _load_features(self):
-        """Initializes SIRIUS features."""
+        """Initializes SIRIUS features iterator."""
         
         self.log("Loading SIRIUS features...", "TEMP")
         
-        # load features from JSON
         features_path = os.path.join(self._workdir, "sirius_features.json")
-        with open(features_path) as f:
-            features_data = json.load(f)
+        return self._iter_features(features_path)
+    
+    
+    def _iter_features(self, features_path):
+        """Iterates SIRIUS features."""
         
-        # initialize features
-        features = []
-        for feat in features_data:
-            
-            # normalize adduct
-            mass, charge, adduct = self._normalize_adduct(
-                feat['Mass'],
-                feat['MW'],
-                feat['Charge'],
-                feat['Adduct'])
-            
-            # init feature
-            feat_input = {}
-            feat_input['name'] = f"{feat['MW']:.5f}@{feat['ApexRT']:.3f}"
-            feat_input['externalFeatureId'] = str(feat["ExternalID"])
-            feat_input['ionMass'] = mass
-            feat_input['charge'] = charge
-            feat_input['detectedAdducts'] = [adduct]
-            feat_input['rtStartSeconds'] = feat["LeftRT"] * 60
-            feat_input['rtEndSeconds'] = feat["RightRT"] * 60
-            
-            # set MS1
-            ms1_input = {}
-            ms1_input['name'] = feat["MS1Spectrum"]["Name"]
-            ms1_input['msLevel'] = feat["MS1Spectrum"]["MSLevel"]
-            ms1_input['scanNumber'] = feat["MS1Spectrum"]["ScanNumber"]
-            
-            ms1_peaks = zip(feat["MS1Spectrum"]["Masses"], feat["MS1Spectrum"]["Intensities"])
-            ms1_input['peaks'] = [{'mz': d[0], 'intensity': d[1]} for d in ms1_peaks]
-            feat_input['mergedMs1'] = ms1_input
-            
-            # set MS2
-            feat_input['ms2Spectra'] = []
-            for spectrum in feat["MS2Spectra"]:
+        try:
+            # stream features from JSON
+            for feat in _iter_json_items(features_path):
+                
+                # normalize adduct
+                mass, charge, adduct = self._normalize_adduct(
+                    feat['Mass'],
+                    feat['MW'],
+                    feat['Charge'],
+                    feat['Adduct'])
+                
+                # set MS1
+                ms1 = feat["MS1Spectrum"]
+                ms1_input = {
+                    'name': ms1["Name"],
+                    'msLevel': ms1["MSLevel"],
+                    'scanNumber': ms1["ScanNumber"],
+                    'peaks': _build_peaks(ms1["Masses"], ms1["Intensities"])}
                 
                 # set MS2
-                ms2_input = {}
-                ms2_input['name'] = spectrum["Name"]
-                ms2_input['msLevel'] = spectrum["MSLevel"]
-                ms2_input['collisionEnergy'] = str(spectrum["CollisionEnergies"][0])
-                ms2_input['precursorMz'] = spectrum["PrecursorMass"]
-                ms2_input['scanNumber'] = spectrum["ScanNumber"]
+                ms2_inputs = [{
+                    'name': spectrum["Name"],
+                    'msLevel': spectrum["MSLevel"],
+                    'collisionEnergy': str(spectrum["CollisionEnergies"][0]),
+                    'precursorMz': spectrum["PrecursorMass"],
+                    'scanNumber': spectrum["ScanNumber"],
+                    'peaks': _build_peaks(spectrum["Masses"], spectrum["Intensities"])}
+                    for spectrum in feat["MS2Spectra"]]
                 
-                ms2_peaks = zip(spectrum["Masses"], spectrum["Intensities"])
-                ms2_input['peaks'] = [{'mz': d[0], 'intensity': d[1]} for d in ms2_peaks]
-                feat_input['ms2Spectra'].append(ms2_input)
-            
-            # add input
-            features.append(feat_input)
+                # init feature
+                feat_input = {
+                    'name': f"{feat['MW']:.5f}@{feat['ApexRT']:.3f}",
+                    'externalFeatureId': str(feat["ExternalID"]),
+                    'ionMass': mass,
+                    'charge': charge,
+                    'detectedAdducts': [adduct],
+                    'rtStartSeconds': feat["LeftRT"] * 60,
+                    'rtEndSeconds': feat["RightRT"] * 60,
+                    'mergedMs1': ms1_input,
+                    'ms2Spectra': ms2_inputs}
+                
+                # provide input
+                yield feat_input
         
-        return features
+        except Exception as err:
+            self.log("Unable to load SIRIUS features!", "ERROR")
+            raise err
     
     
     def _normalize_adduct(self, mz, mw, z, adduct):
         """Normalizes ion mass and adduct to supported adducts."""
         
-        invalid_adducts = ("2M", "+2", "+3", "-2", "-3", "MeOH", "ACN", "-e", "+e")
-        if any(d in adduct for d in invalid_adducts):
+        if _INVALID_ADDUCT_RE.search(adduct):
             
             if z < 0:
-                mz = mw - 1.00727663
+                mz = mw - _PROTON_MASS
                 adduct = "[M-H]-1"
                 z = -1
             else:
-                mz = mw + 1.00727663
+                mz = mw + _PROTON_MASS
                 adduct = "[M+H]+1"
                 z = 1
         
@@ -235,47 +304,22 @@ class CDSirius(object):
         
         self.log(f"Exporting SIRIUS results...", "TEMP")
         
-        # export top annotations
-        annotations = results['SiriusTopAnnotations']
-        if annotations is not None:
-            path = os.path.join(self._workdir, "sirius_top_annotations")
-            self._export_table_json(annotations, path)
-        
-        # export formulas
-        formulas = results['SiriusFormulas']
-        if formulas is not None:
-            path = os.path.join(self._workdir, "sirius_formulas")
-            self._export_table_json(formulas, path)
-        
-        # export classes
-        classes = results['SiriusClasses']
-        if classes is not None:
-            path = os.path.join(self._workdir, "sirius_classes")
-            self._export_table_json(classes, path)
-        
-        # export structures
-        structures = results['SiriusStructures']
-        if structures is not None:
-            path = os.path.join(self._workdir, "sirius_structures")
-            self._export_table_json(structures, path)
-        
-        # export denovo
-        denovo = results['SiriusDeNovoStructures']
-        if denovo is not None:
-            path = os.path.join(self._workdir, "sirius_denovo_structures")
-            self._export_table_json(denovo, path)
-        
-        # export fingerprints
-        fingerprints = results['SiriusFingerprints']
-        if fingerprints is not None:
-            path = self._params["FingerprintsPath"] + "_fingerprints"
-            self._export_table_csv(fingerprints, path, index=True)
-        
-        # export fingerprints defs
-        definitions = results['SiriusFingerprintDefinitions']
-        if definitions is not None:
-            path = self._params["FingerprintsPath"] + "_FPkey"
-            self._export_table_csv(definitions, path)
+        # init exports
+        fp_base = self._params["FingerprintsPath"]
+        exports = (
+            ('SiriusTopAnnotations', os.path.join(self._workdir, "sirius_top_annotations"), self._export_table_json, {}),
+            ('SiriusFormulas', os.path.join(self._workdir, "sirius_formulas"), self._export_table_json, {}),
+            ('SiriusClasses', os.path.join(self._workdir, "sirius_classes"), self._export_table_json, {}),
+            ('SiriusStructures', os.path.join(self._workdir, "sirius_structures"), self._export_table_json, {}),
+            ('SiriusDeNovoStructures', os.path.join(self._workdir, "sirius_denovo_structures"), self._export_table_json, {}),
+            ('SiriusFingerprints', fp_base + "_fingerprints", self._export_table_csv, {'index': True}),
+            ('SiriusFingerprintDefinitions', fp_base + "_FPkey", self._export_table_csv, {}))
+        
+        # export available tables
+        for key, path, exporter, kwargs in exports:
+            table = results.get(key)
+            if table is not None:
+                exporter(table, path, **kwargs)
     
     
     def _export_table_csv(self, table, path, index=False):
@@ -297,9 +341,21 @@ class CDSirius(object):
         
         path = path + '.json'
         
-        table.to_json(path,
-            orient = 'records',
-            lines = True)
+        # use pandas serializer
+        if orjson is None:
+            table.to_json(path,
+                orient = 'records',
+                lines = True)
+            return
+        
+        # init serializer
+        options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE
+        columns = [str(c) for c in table.columns]
+        
+        # write records as JSON lines
+        with open(path, 'wb', buffering=_BUFFER_SIZE) as f:
+            for row in table.itertuples(index=False, name=None):
+                f.write(orjson.dumps(dict(zip(columns, row)), default=_orjson_default, option=options))
 
 
 if __name__ == '__main__':
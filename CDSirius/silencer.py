@@ -3,41 +3,66 @@
 
 # import modules
 import os
+import threading
 
 
 class Silencer(object):
     """Context manager to suppress stdout and/or stderr."""
     
+    # shared null device
+    _null = None
+    _null_lock = threading.Lock()
+    
     
     def __init__(self, stdout=True, stderr=True):
         """Initializes a new instance of Silencer."""
         
         self._stdout = stdout
-        self._stdout_null = os.open(os.devnull, os.O_RDWR)
-        self._stdout_save = os.dup(1)
-        
         self._stderr = stderr
-        self._stderr_null = os.open(os.devnull, os.O_RDWR)
-        self._stderr_save = os.dup(2)
+        
+        self._stdout_save = None
+        self._stderr_save = None
     
     
     def __enter__(self):
         """Implements context manager."""
         
+        # check if anything to silence
+        if not self._stdout and not self._stderr:
+            return
+        
+        # get null device
+        null = self._get_null()
+        
         if self._stdout:
-            os.dup2(self._stdout_null, 1)
+            self._stdout_save = os.dup(1)
+            os.dup2(null, 1)
         
         if self._stderr:
-            os.dup2(self._stderr_null, 2)
+            self._stderr_save = os.dup(2)
+            os.dup2(null, 2)
     
     
     def __exit__(self, *_):
         """Implements context manager."""
         
-        os.dup2(self._stdout_save, 1)
-        os.dup2(self._stderr_save, 2)
+        if self._stdout_save is not None:
+            os.dup2(self._stdout_save, 1)
+            os.close(self._stdout_save)
+            self._stdout_save = None
+        
+        if self._stderr_save is not None:
+            os.dup2(self._stderr_save, 2)
+            os.close(self._stderr_save)
+            self._stderr_save = None
+    
+    
+    @classmethod
+    def _get_null(cls):
+        """Gets shared null device descriptor."""
+        
+        with cls._null_lock:
+            if cls._null is None:
+                cls._null = os.open(os.devnull, os.O_WRONLY)
         
-        os.close(self._stdout_null)
-        os.close(self._stdout_save)
-        os.close(self._stderr_null)
-        os.close(self._stderr_save)
+        return cls._null
@@ -6,20 +6,215 @@ import io
 import os
 import sys
 import time
+import shutil
+import functools
+import itertools
+import concurrent.futures
 import numpy
 import pandas
+import urllib3
 
 import PySirius
+from PySirius.rest import RESTClientObject
 from PySirius.models.feature_import import FeatureImport
-from PySirius.models.formula_candidate import FormulaCandidate
 from PySirius.models.structure_candidate import StructureCandidate
 
 from silencer import Silencer
 
+# define candidate fields
+_FORMULA_FIELDS = {
+    'formulaId': 'formula_id',
+    'molecularFormula': 'molecular_formula',
+    'adduct': 'adduct',
+    'rank': 'rank',
+    'siriusScore': 'sirius_score',
+    'isotopeScore': 'isotope_score',
+    'treeScore': 'tree_score',
+    'numOfExplainedPeaks': 'num_of_explained_peaks',
+    'numOfExplainablePeaks': 'num_of_explainable_peaks',
+    'totalExplainedIntensity': 'total_explained_intensity'}
+
+_CLASS_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'level': 'level',
+    'levelIndex': 'level_index',
+    'probability': 'probability'}
+
+# define top annotation field types
+_ANNOTATION_DTYPES = {
+    'ExternalID': 'Int64',
+    'FeatureName': 'object',
+    'Formula': 'object',
+    'FormulaScore': 'float64',
+    'CSIFingerIDName': 'object',
+    'CSIFingerIDInChIKey': 'object',
+    'CSIFingerIDScore': 'float64',
+    'CSIFingerIDTanimotoSimilarity': 'float64',
+    'CSIFingerIDConfidenceExact': 'float64',
+    'CSIFingerIDConfidenceApprox': 'float64',
+    'ClassyFireLevel1': 'object',
+    'ClassyFireLevel2': 'object',
+    'ClassyFireLevel3': 'object',
+    'ClassyFireLevel4': 'object',
+    'ClassyFireLevel5': 'object',
+    'ClassyFireLevel6': 'object'}
+
+# define exported table columns
+_ANNOTATION_COLUMNS = list(_ANNOTATION_DTYPES)
+
+_FORMULA_COLUMNS = [
+    'formulaId',
+    'molecularFormula',
+    'adduct',
+    'rank',
+    'siriusScore',
+    'isotopeScore',
+    'treeScore',
+    'numOfExplainedPeaks',
+    'numOfExplainablePeaks',
+    'totalExplainedIntensity',
+    'ExternalID',
+    'MS2ErrorPpm']
+
+_CLASS_COLUMNS = [
+    'id',
+    'name',
+    'description',
+    'level',
+    'levelIndex',
+    'probability',
+    'ExternalID',
+    'SiriusFormulaID',
+    'TreeID']
+
+_STRUCTURE_COLUMNS = [
+    'inchiKey',
+    'smiles',
+    'structureName',
+    'xlogP',
+    'rank',
+    'csiScore',
+    'tanimotoSimilarity',
+    'formulaId',
+    'molecularFormula',
+    'adduct',
+    'ExternalID']
+
+_DENOVO_COLUMNS = [
+    'inchiKey',
+    'smiles',
+    'structureName',
+    'xlogP',
+    'rank',
+    'csiScore',
+    'tanimotoSimilarity',
+    'mcesDistToTopHit',
+    'formulaId',
+    'molecularFormula',
+    'adduct',
+    'ExternalID']
+
+# define exported table renames
+_FORMULA_RENAME = {
+    'formulaId': 'SiriusFormulaID',
+    'molecularFormula': 'Formula',
+    'adduct': 'Adduct',
+    'rank': 'Rank',
+    'siriusScore': 'SiriusScore',
+    'isotopeScore': 'IsotopeScore',
+    'treeScore': 'TreeScore',
+    'numOfExplainedPeaks': 'ExplainedPeaksCount',
+    'numOfExplainablePeaks': 'ExplainablePeaksCount',
+    'totalExplainedIntensity': 'ExplainedIntensity'}
+
+_CLASS_RENAME = {
+    'id': 'ClassID',
+    'name': 'Name',
+    'level': 'Level',
+    'levelIndex': 'LevelIndex',
+    'description': 'Description',
+    'probability': 'Probability'}
+
+_STRUCTURE_RENAME = {
+    'formulaId': 'SiriusFormulaID',
+    'molecularFormula': 'Formula',
+    'inchiKey': 'InChIKey',
+    'smiles': 'SMILES',
+    'structureName': 'Name',
+    'xlogP': 'LogKow',
+    'rank': 'Rank',
+    'csiScore': 'CSIScore',
+    'tanimotoSimilarity': 'TanimotoSimilarity',
+    'adduct': 'Adduct'}
+
+# define exported table field types
+_FORMULA_DTYPES = {
+    'SiriusFormulaID': 'Int64',
+    'Formula': 'object',
+    'Adduct': 'object',
+    'Rank': 'Int64',
+    'ExplainedPeaksCount': 'Int64',
+    'ExplainablePeaksCount': 'Int64',
+    'ExternalID': 'Int64'}
+
+_CLASS_DTYPES = {
+    'ClassID': 'Int64',
+    'Name': 'object',
+    'Description': 'object',
+    'Level': 'object',
+    'LevelIndex': 'Int64',
+    'ExternalID': 'Int64',
+    'SiriusFormulaID': 'Int64',
+    'TreeID': 'int64'}
+
+_STRUCTURE_DTYPES = {
+    'InChIKey': 'object',
+    'SMILES': 'object',
+    'Name': 'object',
+    'Rank': 'Int64',
+    'SiriusFormulaID': 'Int64',
+    'Formula': 'object',
+    'Adduct': 'object',
+    'ExternalID': 'Int64'}
+
 
 class SiriusConfig(object):
     """Defines configuration for SIRIUS search."""
     
+    __slots__ = (
+        'silence_api',
+        'service_path',
+        'service_port',
+        'service_start_timeout',
+        'project_name',
+        'project_path',
+        'account_username',
+        'account_password',
+        'formula_id_enabled',
+        'formula_id_profile',
+        'formula_id_mass_accuracy_ms2ppm',
+        'formula_id_filter_by_isotope_pattern',
+        'formula_id_enforce_el_gordo_formula',
+        'formula_id_perform_bottom_up_search',
+        'formula_id_perform_denovo_below_mz',
+        'formula_id_enforced_formula_constraints',
+        'formula_id_detectable_elements',
+        'formula_id_formula_search_dbs',
+        'ms1_mass_deviation_allowed',
+        'canopus_enabled',
+        'fingerprint_prediction_enabled',
+        'fingerprint_prediction_save',
+        'structure_db_search_enabled',
+        'structure_db_search_dbs',
+        'structure_db_search_pubchem_fallback',
+        'structure_db_search_candidates',
+        'ms_novelist_enabled',
+        'ms_novelist_candidates',
+        'import_batch_size',
+        'retrieve_workers')
+    
     
     def __init__(self):
         """Initializes a new instance of SiriusConfig."""
@@ -30,6 +225,7 @@ class SiriusConfig(object):
         # main service
         self.service_path: str = r"C:\Program Files\Sirius\sirius.exe"
         self.service_port: int | None = 8080
+        self.service_start_timeout: float = 60.0
 
         # project space
         self.project_name: str = ""
@@ -68,6 +264,12 @@ class SiriusConfig(object):
         # denovo structure search
         self.ms_novelist_enabled: bool = True
         self.ms_novelist_candidates: int = 10
+        
+        # feature import
+        self.import_batch_size: int = 2000
+        
+        # results retrieval
+        self.retrieve_workers: int = 16
 
 
 class Sirius(object):
@@ -80,12 +282,17 @@ class Sirius(object):
         self._config: SiriusConfig = config
         self._api = None
         self._logger = logger
+        self._confidence_mode = None
+        self._features_cache = {}
+        self._definitions_cache = {}
     
     
     def __enter__(self):
         """Implements context manager."""
         
         # silence errors from SIRIUS
+        # Silencer swaps process-wide descriptors, so it is only used around
+        # service setup and teardown, never around individual API calls
         with Silencer(stdout=False, stderr=self._config.silence_api):
             
             # connect to existing service
@@ -95,6 +302,9 @@ class Sirius(object):
                 if not self.start():
                     raise RuntimeError("Unable to connect or start SIRIUS service!")
             
+            # init connection pool
+            self._init_client()
+            
             # login
             if not self.login():
                 raise RuntimeError("Unable to login to SIRIUS account!")
@@ -141,6 +351,7 @@ class Sirius(object):
             
             # check connection
             if self._api:
+                self._confidence_mode = self._api.models().ConfidenceMode
                 self.log("Connected to running SIRIUS service.", "VERBOSE")
                 return True
             else:
@@ -168,11 +379,9 @@ class Sirius(object):
                 port = self._config.service_port,
                 headless = True)
             
-            # wait for all to be initialized
-            time.sleep(10)
-            
             # check connection
-            if self._api:
+            if self._api and self._wait_ready():
+                self._confidence_mode = self._api.models().ConfidenceMode
                 self.log("SIRIUS service started.", "VERBOSE")
                 return True
             else:
@@ -184,6 +393,48 @@ class Sirius(object):
             raise err
     
     
+    def _wait_ready(self):
+        """Waits until SIRIUS service responds."""
+        
+        info_api = PySirius.InfoApi(self._api.get_client())
+        
+        start = time.monotonic()
+        while True:
+            
+            # check service info
+            try:
+                info_api.get_info()
+                self.log(f"SIRIUS service ready after {time.monotonic() - start:.1f} s.", "VERBOSE")
+                return True
+            
+            except (PySirius.ApiException, urllib3.exceptions.HTTPError):
+                pass
+            
+            # check timeout
+            if time.monotonic() - start > self._config.service_start_timeout:
+                self.log("SIRIUS service not ready in time.", "VERBOSE")
+                return False
+            
+            # just wait
+            time.sleep(0.2)
+    
+    
+    def _init_client(self):
+        """Sizes API client connection pool and retries for concurrent requests."""
+        
+        client = self._api.get_client()
+        
+        # set pool size
+        if client.configuration.connection_pool_maxsize < self._config.retrieve_workers:
+            client.configuration.connection_pool_maxsize = self._config.retrieve_workers
+        
+        # set retries, POST requests are not retried by default
+        client.configuration.retries = urllib3.Retry(total=3, backoff_factor=0.1)
+        
+        # recreate pool
+        client.rest_client = RESTClientObject(client.configuration)
+    
+    
     def login(self):
         """Connecting SIRIUS account."""
         
@@ -230,6 +481,10 @@ class Sirius(object):
             self.log("SIRIUS service cannot be shut down due to running projects!", "WARNING")
             return
         
+        # drop cached responses
+        self._features_cache.clear()
+        self._definitions_cache.clear()
+        
         # shut down the service
         try:
             response = PySirius.ActuatorApi(self._api.get_client()).shutdown_with_http_info()
@@ -247,9 +502,17 @@ class Sirius(object):
         self.log("Creating SIRIUS project...", "TEMP")
         
         # remove if exists
-        if os.path.exists(self._config.project_path):
+        try:
             os.remove(self._config.project_path)
         
+        except FileNotFoundError:
+            pass
+        
+        except (IsADirectoryError, PermissionError):
+            if not os.path.isdir(self._config.project_path):
+                raise
+            shutil.rmtree(self._config.project_path)
+        
         # init SIRIUS project
         try:
             project = self._api.projects().create_project(self._config.project_name, path_to_project=self._config.project_path)
@@ -290,9 +553,9 @@ class Sirius(object):
             job.structure_db_search_params.structure_search_dbs = self._config.structure_db_search_dbs
             
             if self._config.structure_db_search_pubchem_fallback:
-                job.structure_db_search_params.expansive_search_confidence_mode = self._api.models().ConfidenceMode.APPROXIMATE
+                job.structure_db_search_params.expansive_search_confidence_mode = self._confidence_mode.APPROXIMATE
             else:
-                job.structure_db_search_params.expansive_search_confidence_mode = self._api.models().ConfidenceMode.OFF
+                job.structure_db_search_params.expansive_search_confidence_mode = self._confidence_mode.OFF
             
             if job.structure_db_search_params.enabled:
                 job.canopus_params.enabled = self._config.canopus_enabled
@@ -325,15 +588,20 @@ class Sirius(object):
             self.log("Could not submit SIRIUS job!", "ERROR")
             raise err
         
+        # invalidate cached responses
+        self._features_cache.pop(project.project_id, None)
+        
         # wait while processing
+        delay = 1
         while True:
             
             # get current state
-            state = self._api.jobs().get_job(project.project_id, submission.id).progress.state
+            job_status = self._api.jobs().get_job(project.project_id, submission.id)
+            state = job_status.progress.state
             
             # show progress
-            progress = self._api.jobs().get_job(project.project_id, submission.id).progress.current_progress
-            progress_max = self._api.jobs().get_job(project.project_id, submission.id).progress.max_progress
+            progress = job_status.progress.current_progress
+            progress_max = job_status.progress.max_progress
             if progress_max:
                 self.log(f"{progress/progress_max*100:.0f}", "PROGRESS")
             
@@ -353,7 +621,8 @@ class Sirius(object):
                 return False
             
             # just wait
-            time.sleep(10)
+            time.sleep(delay)
+            delay = min(2 * delay, 10)
     
     
     def close_project(self, project):
@@ -361,6 +630,10 @@ class Sirius(object):
         
         self.log("Closing SIRIUS jobs and project...", "TEMP")
         
+        # invalidate cached responses
+        self._features_cache.pop(project.project_id, None)
+        self._definitions_cache.pop(project.project_id, None)
+        
         try:
             self._api.jobs().delete_jobs(project.project_id)
             self._api.projects().close_project(project.project_id)
@@ -383,9 +656,21 @@ class Sirius(object):
             self.log(f"Could not get current SIRIUS projects!", "ERROR")
             raise err
             
-        # delete jobs
-        for project in projects:
-            self.close_project(project)
+        # close projects
+        failed = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [(project, executor.submit(self.close_project, project)) for project in projects]
+            for project, future in futures:
+                try:
+                    future.result()
+                except Exception as err:
+                    self.log(f"Could not close SIRIUS project '{project.project_id}': {err}", "ERROR")
+                    failed.append((project.project_id, err))
+        
+        # check failed
+        if failed:
+            ids = ', '.join(project_id for project_id, _ in failed)
+            raise RuntimeError(f"Unable to close SIRIUS projects: {ids}") from failed[0][1]
     
     
     def set_features(self, project, features):
@@ -393,30 +678,38 @@ class Sirius(object):
         
         self.log("Setting features to SIRIUS...", "TEMP")
         
-        # init buff
-        sirius_features = []
-        
-        # convert to SIRIUS feature
-        try:
-            for feat in features:
-                sirius_feature = FeatureImport.from_dict(feat)
-                sirius_features.append(sirius_feature)
-        
-        except Exception as err:
-            self.log("Unable to convert features for SIRIUS service!", 'ERROR')
-            raise err
-        
-        # set features to API
-        try:
-            self._api.features().add_aligned_features(
-                project.project_id,
-                sirius_features,
-                profile = PySirius.InstrumentProfile("ORBITRAP"),
-                opt_fields = ["msData"])
+        # invalidate cached responses
+        self._features_cache.pop(project.project_id, None)
         
-        except Exception as err:
-            self.log("Unable to set features to SIRIUS service!", 'ERROR')
-            raise err
+        features = iter(features)
+        while True:
+            
+            # get next batch
+            batch = list(itertools.islice(features, self._config.import_batch_size))
+            
+            # convert batch to SIRIUS features
+            try:
+                sirius_features = [FeatureImport.from_dict(feat) for feat in batch]
+            
+            except Exception as err:
+                self.log("Unable to convert features for SIRIUS service!", 'ERROR')
+                raise err
+            
+            # check if done
+            if not sirius_features:
+                break
+            
+            # set features to API
+            try:
+                self._api.features().add_aligned_features(
+                    project.project_id,
+                    sirius_features,
+                    profile = PySirius.InstrumentProfile("ORBITRAP"),
+                    opt_fields = ["msData"])
+            
+            except Exception as err:
+                self.log("Unable to set features to SIRIUS service!", 'ERROR')
+                raise err
     
     
     def retrieve_results(self, job, project):
@@ -435,56 +728,60 @@ class Sirius(object):
             'SiriusFingerprintDefinitions': None}
         
         # init buffs
-        annotations = []
+        annotations = {c: [] for c in _ANNOTATION_COLUMNS}
+        fingerprints = []
         formulas = []
         structures = []
         classes = []
         denovo = []
-        class_tree_id = [1]
+        class_tree_ids = itertools.count(1)
+        
+        # get features with top annotation information
+        features = self._get_aligned_features(project.project_id)
+        features = [f for f in features if f.top_annotations.formula_annotation is not None]
         
-        # get feature IDs
-        feature_ids = [fid.aligned_feature_id for fid in self._api.features().get_aligned_features(project.project_id)]
+        # init formula candidate fields
+        formula_fields = ["statistics"]
+        if self._config.fingerprint_prediction_save:
+            formula_fields.append("predictedFingerprint")
+        if job.canopus_params.enabled:
+            formula_fields.append("compoundClasses")
+        
+        # init database names
+        db_names = tuple(n.upper() for n in self._config.structure_db_search_dbs)
         
         # retrieve results
-        for feat_id in feature_ids:
-            
-            # get feature info with top annotation information
-            feature = self._api.features().get_aligned_feature(project.project_id, feat_id, opt_fields=["topAnnotations"])
-            if feature.top_annotations.formula_annotation is None:
-                continue
-            
-            # get external ID
-            ext_id = feature.external_feature_id
-            
-            # get top formula ID
-            top_formula_id = feature.top_annotations.formula_annotation.formula_id
-            
-            # retrieve top annotation
-            top_annotation = self._retrieve_annotation(ext_id, feature)
-            annotations.append(top_annotation)
-            
-            # retrieve all formula predictions
-            table = self._retrieve_formulas(project, ext_id, feat_id, top_annotation, top_formula_id)
-            if table is not None:
-                formulas.append(table)
-            
-            # retrieve all compound class predictions
-            tables = self._retrieve_classes(job, project, ext_id, feat_id, class_tree_id)
-            if tables is not None:
-                classes += tables
-            
-            # retrieve all CSI:FingerID database structure predictions
-            table = self._retrieve_structures(job, project, ext_id, feat_id)
-            if table is not None:
-                structures.append(table)
-            
-            # retrieve all MSNovelist de novo structure predictions
-            table = self._retrieve_denovo(job, project, ext_id, feat_id)
-            if table is not None:
-                denovo.append(table)
+        retrieve = functools.partial(self._retrieve_feature, job, project, formula_fields, db_names)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._config.retrieve_workers) as executor:
+            for top_annotation, formulas_rows, classes_trees, structures_rows, denovo_rows in executor.map(retrieve, features):
+                
+                # store top annotation by columns
+                fingerprints.append(top_annotation.pop('topFingerprint', None))
+                for key, values in annotations.items():
+                    values.append(top_annotation[key])
+                
+                # store formula predictions
+                if formulas_rows is not None:
+                    formulas += formulas_rows
+                
+                # store compound class predictions
+                if classes_trees is not None:
+                    for tree in classes_trees:
+                        tree_id = next(class_tree_ids)
+                        for row in tree:
+                            row['TreeID'] = tree_id
+                        classes += tree
+                
+                # store CSI:FingerID database structure predictions
+                if structures_rows is not None:
+                    structures += structures_rows
+                
+                # store MSNovelist de novo structure predictions
+                if denovo_rows is not None:
+                    denovo += denovo_rows
         
         # retrieve fingerprints
-        predictions, definitions = self._retrieve_fingerprints(project, annotations)
+        predictions, definitions = self._retrieve_fingerprints(project, annotations, fingerprints)
         results['SiriusFingerprints'] = predictions
         results['SiriusFingerprintDefinitions'] = definitions
         
@@ -495,6 +792,48 @@ class Sirius(object):
         return results
     
     
+    def _get_aligned_features(self, project_id):
+        """Gets features with top annotations, reusing previous response of the project."""
+        
+        features = self._features_cache.get(project_id)
+        if features is None:
+            features = self._api.features().get_aligned_features(project_id, opt_fields=["topAnnotations"])
+            self._features_cache[project_id] = features
+        
+        return features
+    
+    
+    def _retrieve_feature(self, job, project, formula_fields, db_names, feature):
+        """Retrieves all results of single feature."""
+        
+        # get IDs
+        ext_id = feature.external_feature_id
+        feat_id = feature.aligned_feature_id
+        
+        # get top formula ID
+        top_formula_id = feature.top_annotations.formula_annotation.formula_id
+        
+        # retrieve top annotation
+        top_annotation = self._retrieve_annotation(ext_id, feature)
+        
+        # get all formula candidates
+        candidates = self._api.features().get_formula_candidates(project.project_id, feat_id, opt_fields=formula_fields)
+        
+        # retrieve all formula predictions
+        formulas = self._retrieve_formulas(candidates, ext_id, top_annotation, top_formula_id)
+        
+        # retrieve all compound class predictions
+        classes = self._retrieve_classes(job, candidates, ext_id)
+        
+        # retrieve all CSI:FingerID database structure predictions
+        structures = self._retrieve_structures(job, project, ext_id, feat_id, db_names)
+        
+        # retrieve all MSNovelist de novo structure predictions
+        denovo = self._retrieve_denovo(job, project, ext_id, feat_id, db_names)
+        
+        return top_annotation, formulas, classes, structures, denovo
+    
+    
     def _retrieve_annotation(self, ext_id, feat):
         """Retrieves top annotation."""
         
@@ -507,156 +846,94 @@ class Sirius(object):
         # get feature name
         annotation['FeatureName'] = feat.name
         
+        # get top annotations
+        top = feat.top_annotations
+        formula = top.formula_annotation
+        structure = top.structure_annotation
+        compound_class = top.compound_class_annotation
+        
         # get top formula annotation information
-        annotation['Formula'] = feat.top_annotations.formula_annotation.molecular_formula
-        annotation['FormulaScore'] = feat.top_annotations.formula_annotation.sirius_score
+        annotation['Formula'] = formula.molecular_formula
+        annotation['FormulaScore'] = formula.sirius_score
         
         # get top structure annotation
-        has_structure = feat.top_annotations.structure_annotation is not None
+        has_structure = structure is not None
         
-        annotation['CSIFingerIDName'] = feat.top_annotations.structure_annotation.structure_name if has_structure else ""
-        annotation['CSIFingerIDInChIKey'] = feat.top_annotations.structure_annotation.inchi_key if has_structure else ""
-        annotation['CSIFingerIDScore'] = feat.top_annotations.structure_annotation.csi_score if has_structure else ""
-        annotation['CSIFingerIDTanimotoSimilarity'] = feat.top_annotations.structure_annotation.tanimoto_similarity if has_structure else ""
-        annotation['CSIFingerIDConfidenceExact'] = feat.top_annotations.confidence_exact_match if has_structure else ""
-        annotation['CSIFingerIDConfidenceApprox'] = feat.top_annotations.confidence_approx_match if has_structure else ""
+        annotation['CSIFingerIDName'] = structure.structure_name if has_structure else ""
+        annotation['CSIFingerIDInChIKey'] = structure.inchi_key if has_structure else ""
+        annotation['CSIFingerIDScore'] = structure.csi_score if has_structure else None
+        annotation['CSIFingerIDTanimotoSimilarity'] = structure.tanimoto_similarity if has_structure else None
+        annotation['CSIFingerIDConfidenceExact'] = top.confidence_exact_match if has_structure else None
+        annotation['CSIFingerIDConfidenceApprox'] = top.confidence_approx_match if has_structure else None
         
         # get top ClassyFire classification
-        has_class = feat.top_annotations.compound_class_annotation is not None
-        lineage = feat.top_annotations.compound_class_annotation.classy_fire_lineage if has_class else None
-        lineage_len = len(feat.top_annotations.compound_class_annotation.classy_fire_lineage) if lineage else 0
+        lineage = (compound_class.classy_fire_lineage if compound_class is not None else None) or []
         
-        annotation['ClassyFireLevel1'] = feat.top_annotations.compound_class_annotation.classy_fire_lineage[0].name if lineage_len > 0 else ""
-        annotation['ClassyFireLevel2'] = feat.top_annotations.compound_class_annotation.classy_fire_lineage[1].name if lineage_len > 1 else ""
-        annotation['ClassyFireLevel3'] = feat.top_annotations.compound_class_annotation.classy_fire_lineage[2].name if lineage_len > 2 else ""
-        annotation['ClassyFireLevel4'] = feat.top_annotations.compound_class_annotation.classy_fire_lineage[3].name if lineage_len > 3 else ""
-        annotation['ClassyFireLevel5'] = feat.top_annotations.compound_class_annotation.classy_fire_lineage[4].name if lineage_len > 4 else ""
-        annotation['ClassyFireLevel6'] = feat.top_annotations.compound_class_annotation.classy_fire_lineage[5].name if lineage_len > 5 else ""
+        for i in range(6):
+            annotation[f'ClassyFireLevel{i+1}'] = lineage[i].name if i < len(lineage) else ""
         
         return annotation
     
     
-    def _retrieve_formulas(self, project, ext_id, feat_id, top_annotation, top_formula_id):
+    def _retrieve_formulas(self, candidates, ext_id, top_annotation, top_formula_id):
         """Retrieves all SIRIUS formula predictions."""
         
-        # get all candidates
-        candidates = self._api.features().get_formula_candidates(project.project_id, feat_id, opt_fields=["statistics", "predictedFingerprint"])
-        candidates_dicts = [FormulaCandidate.to_dict(d) for d in candidates]
-        candidates_df = pandas.DataFrame.from_dict(candidates_dicts)
-        
         # check candidates
-        if candidates_df.empty:
-            return None, None
+        if not candidates:
+            return None
         
-        # assign external ID
-        candidates_df['ExternalID'] = ext_id
+        # get candidate fields
+        rows = [{k: getattr(c, a) for k, a in _FORMULA_FIELDS.items()} for c in candidates]
         
-        # set MS2 errors
-        candidates_df['MS2ErrorPpm'] = pandas.DataFrame(candidates_df['medianMassDeviation'].tolist())['ppm']
+        # assign external ID and MS2 errors
+        for row, candidate in zip(rows, candidates):
+            deviation = candidate.median_mass_deviation
+            row['ExternalID'] = ext_id
+            row['MS2ErrorPpm'] = deviation.ppm if deviation is not None else None
         
         # assign top annotation fingerprint if requested
         if self._config.fingerprint_prediction_save:
-            top_fingerprint = candidates_df.loc[candidates_df['formulaId'] == top_formula_id, 'predictedFingerprint'].item()
+            top_fingerprint = next((c.predicted_fingerprint for c in candidates if c.formula_id == top_formula_id), None)
             top_annotation['topFingerprint'] = [] if top_fingerprint is None else top_fingerprint
         
-        # drop predictedFingerprint field
-        candidates_df.drop(['predictedFingerprint'], axis=1, inplace=True)
-        
-        # drop extraneous table fields
-        candidates_df.drop(
-            columns = [
-                'medianMassDeviation',
-                'compoundClasses',
-                'siriusScoreNormalized',
-                'zodiacScore',
-                'fragmentationTree',
-                'annotatedSpectrum',
-                'isotopePatternAnnotation',
-                'lipidAnnotation',
-                'canopusPrediction'],
-            inplace = True)
-        
-        # rename table fields for CD
-        candidates_df.rename(
-            columns = {
-                'formulaId': 'SiriusFormulaID',
-                'molecularFormula': 'Formula',
-                'adduct': 'Adduct',
-                'rank': 'Rank',
-                'siriusScore': 'SiriusScore',
-                'isotopeScore': 'IsotopeScore',
-                'treeScore': 'TreeScore',
-                'numOfExplainedPeaks': 'ExplainedPeaksCount',
-                'numOfExplainablePeaks': 'ExplainablePeaksCount',
-                'totalExplainedIntensity': 'ExplainedIntensity'},
-            inplace = True)
-        
-        return candidates_df
-    
-    
-    def _retrieve_classes(self, job, project, ext_id, feat_id, tree_id):
+        return rows
+    
+    
+    def _retrieve_classes(self, job, candidates, ext_id):
         """Retrieves all compound class predictions."""
         
         # check if enabled
         if not job.canopus_params.enabled:
             return None
         
-        # get all candidates
-        candidates = self._api.features().get_formula_candidates(project.project_id, feat_id, opt_fields=["compoundClasses"])
-        candidates_dicts = [FormulaCandidate.to_dict(d) for d in candidates]
-        
         # check candidates
-        if not candidates_dicts:
+        if not candidates:
             return None
         
         # get all compound class predictions if available
         classes = []
-        for cmpd_class in candidates_dicts:
+        for candidate in candidates:
             
             # check class
-            if cmpd_class['compoundClasses'] is None:
+            if candidate.compound_classes is None:
                 continue
             
             # get all classes
-            cmpd_class_df = pandas.DataFrame.from_dict(cmpd_class['compoundClasses']['classyFireLineage'])
-            
-            # assign external ID
-            cmpd_class_df['ExternalID'] = ext_id
-            
-            # assign formula ID
-            cmpd_class_df['SiriusFormulaID'] = cmpd_class['formulaId']
-            
-            # assign tree ID
-            cmpd_class_df['TreeID'] = tree_id[0]
-            tree_id[0] += 1
-            
-            # drop extraneous table fields
-            cmpd_class_df.drop(
-                columns = [
-                    'type',
-                    'index',
-                    'parentId',
-                    'parentName'],
-                inplace = True)
-            
-            # rename table fields for CD
-            cmpd_class_df.rename(
-                columns = {
-                    'id': 'ClassID',
-                    'name': 'Name',
-                    'level': 'Level',
-                    'levelIndex': 'LevelIndex',
-                    'description': 'Description',
-                    'probability': 'Probability'},
-                inplace = True)
-            
-            # store class
-            classes.append(cmpd_class_df)
+            lineage = candidate.compound_classes.classy_fire_lineage
+            rows = [{k: getattr(c, a) for k, a in _CLASS_FIELDS.items()} for c in lineage]
+            
+            # assign external and formula ID
+            for row in rows:
+                row['ExternalID'] = ext_id
+                row['SiriusFormulaID'] = candidate.formula_id
+            
+            # store class tree
+            classes.append(rows)
         
         return classes
     
     
-    def _retrieve_structures(self, job, project, ext_id, feat_id):
+    def _retrieve_structures(self, job, project, ext_id, feat_id, db_names):
         """Retrieves all CSI:FingerID database structure predictions."""
         
         # check if enabled
@@ -665,52 +942,24 @@ class Sirius(object):
         
         # get all candidates
         candidates = self._api.features().get_structure_candidates(project.project_id, feat_id, opt_fields=["dbLinks"])
-        candidates_dicts = [StructureCandidate.to_dict(d) for d in candidates]
-        candidates_df = pandas.DataFrame.from_dict(candidates_dicts)
-        
-        # check candidates
-        if candidates_df.empty:
-            return None
         
         # limit number of matches per compound
         max_rank = self._config.structure_db_search_candidates
-        candidates_df.drop(candidates_df[candidates_df['rank'] > max_rank].index, inplace=True)
+        rows = [StructureCandidate.to_dict(d) for d in candidates if d.rank is None or d.rank <= max_rank]
         
-        # assign external ID
-        candidates_df['ExternalID'] = ext_id
-        
-        # add DB links to main results
-        db_links = self._retrieve_db_ids(candidates_df)
-        link_df = pandas.DataFrame(db_links)
-        candidates_df = pandas.concat([candidates_df, link_df], axis=1)
+        # check candidates
+        if not rows:
+            return None
         
-        # drop extraneous table fields
-        candidates_df.drop([
-            'dbLinks',
-            'spectralLibraryMatches',
-            'mcesDistToTopHit'],
-            axis = 1,
-            inplace = True)
+        # assign external ID and DB links
+        for row in rows:
+            row['ExternalID'] = ext_id
+            row.update(self._retrieve_db_ids(row['dbLinks'], db_names))
         
-        # rename table fields for CD
-        candidates_df.rename(
-            columns = {
-                'formulaId': 'SiriusFormulaID',
-                'molecularFormula': 'Formula',
-                'inchiKey': 'InChIKey',
-                'smiles': 'SMILES',
-                'structureName': 'Name',
-                'xlogP': 'LogKow',
-                'rank': 'Rank',
-                'csiScore': 'CSIScore',
-                'tanimotoSimilarity': 'TanimotoSimilarity',
-                'adduct': 'Adduct'},
-            inplace = True)
-        
-        return candidates_df
-    
-    
-    def _retrieve_denovo(self, job, project, ext_id, feat_id):
+        return rows
+    
+    
+    def _retrieve_denovo(self, job, project, ext_id, feat_id, db_names):
         """Retrieves all MSNovelist de novo structure predictions."""
         
         # check if enabled
@@ -719,92 +968,76 @@ class Sirius(object):
         
         # get all candidates
         candidates = self._api.features().get_de_novo_structure_candidates(project.project_id, feat_id, opt_fields=["dbLinks"])
-        candidates_dicts = [StructureCandidate.to_dict(d) for d in candidates]
-        candidates_df = pandas.DataFrame.from_dict(candidates_dicts)
-        
-        # check candidates
-        if candidates_df.empty:
-            return None
         
         # limit number of matches per compound
         max_rank = self._config.ms_novelist_candidates
-        candidates_df.drop(candidates_df[candidates_df['rank'] > max_rank].index, inplace=True)
+        rows = [StructureCandidate.to_dict(d) for d in candidates if d.rank is None or d.rank <= max_rank]
         
-        # assign external ID
-        candidates_df['ExternalID'] = ext_id
-        
-        # add DB links to main results
-        db_links = self._retrieve_db_ids(candidates_df)
-        link_df = pandas.DataFrame(db_links)
-        candidates_df = pandas.concat([candidates_df, link_df], axis=1)
+        # check candidates
+        if not rows:
+            return None
         
-        # drop extraneous table fields
-        candidates_df.drop([
-            'dbLinks',
-            'spectralLibraryMatches'],
-            axis = 1,
-            inplace = True)
+        # assign external ID and DB links
+        for row in rows:
+            row['ExternalID'] = ext_id
+            row.update(self._retrieve_db_ids(row['dbLinks'], db_names))
         
-        # rename table fields for CD
-        candidates_df.rename(
-            columns = {
-                'formulaId': 'SiriusFormulaID',
-                'molecularFormula': 'Formula',
-                'inchiKey': 'InChIKey',
-                'smiles': 'SMILES',
-                'structureName': 'Name',
-                'xlogP': 'LogKow',
-                'rank': 'Rank',
-                'csiScore': 'CSIScore',
-                'tanimotoSimilarity': 'TanimotoSimilarity',
-                'adduct': 'Adduct'},
-            inplace = True)
-        
-        return candidates_df
-    
-    
-    def _retrieve_fingerprints(self, project, annotations):
+        return rows
+    
+    
+    def _retrieve_fingerprints(self, project, annotations, fingerprints):
         """Retrieves all compound class predictions."""
         
         # check if enabled
         if not self._config.fingerprint_prediction_save:
             return None, None
         
-        # get data
-        data = self._api.projects().get_finger_id_data(project.project_id, 1)
-        definitions = io.StringIO(data)
-        definitions_df = pandas.read_csv(definitions, sep='\t')
+        # check items
+        if not fingerprints:
+            return None, None
+        
+        # get definitions
+        definitions_df = self._get_fingerprint_definitions(project.project_id, 1)
+        
+        # get fingerprint predictions, missing values padded by NaN
+        fingerprints = [f or [] for f in fingerprints]
+        predictions = numpy.full((len(fingerprints), max(map(len, fingerprints))), numpy.nan)
+        for i, fingerprint in enumerate(fingerprints):
+            predictions[i, :len(fingerprint)] = fingerprint
         
-        # get fingerprint predictions
-        annotations_df = pandas.DataFrame.from_dict(annotations)
-        annotations_df['ExternalID'] = annotations_df['ExternalID'].astype('Int64')
-        predictions = annotations_df['topFingerprint'].tolist()
-        predictions_df = pandas.DataFrame(predictions, index=annotations_df['ExternalID'])
+        ext_ids = pandas.array(annotations['ExternalID'], dtype='Int64')
+        index = pandas.Index(ext_ids, name='ExternalID', copy=False)
+        predictions_df = pandas.DataFrame(numpy.asfortranarray(predictions), index=index, copy=False)
         
         predictions_df.insert(
             loc = 0,
             column = 'SiriusFeatureName',
-            value = annotations_df['FeatureName'].values)
+            value = annotations['FeatureName'])
         
         return predictions_df, definitions_df
     
     
-    def _retrieve_db_ids(self, candidates_df):
+    def _get_fingerprint_definitions(self, project_id, charge):
+        """Gets fingerprint definitions, reusing previous response of the project and charge."""
+        
+        cache = self._definitions_cache.setdefault(project_id, {})
+        definitions_df = cache.get(charge)
+        if definitions_df is None:
+            data = self._api.projects().get_finger_id_data(project_id, charge)
+            definitions = io.StringIO(data)
+            definitions_df = pandas.read_csv(definitions, sep='\t')
+            cache[charge] = definitions_df
+        
+        return definitions_df
+    
+    
+    def _retrieve_db_ids(self, links, db_names):
         """Retrieves database IDs."""
         
-        db_links = []
-        for links in candidates_df['dbLinks']:
-            
-            ids = {}
-            for db_name in self._config.structure_db_search_dbs:
-                db_name = db_name.upper()
-                db_id = next((d for d in links if d["name"].upper() == db_name), None)
-                if db_id:
-                    db_id = db_id['id']
-                ids[db_name] = db_id
-            db_links.append(ids)
+        # map links by name, keeping the first link of each database
+        link_map = {d["name"].upper(): d["id"] for d in reversed(links)}
         
-        return db_links
+        return {n: link_map.get(n) for n in db_names}
     
     
     def _finalize_results(self, annotations, formulas, classes, structures, denovo):
@@ -812,28 +1045,18 @@ class Sirius(object):
         
         self.log(f"Finalizing SIRIUS results...", "TEMP")
         
-        # init results
-        results = {}
-        
-        # finalize annotations
-        table = self._finalize_annotations(annotations)
-        results['SiriusTopAnnotations'] = table
-        
-        # finalize formulas
-        table = self._finalize_formulas(formulas)
-        results['SiriusFormulas'] = table
-        
-        # finalize classes
-        table = self._finalize_classes(classes)
-        results['SiriusClasses'] = table
+        # init finalizers
+        finalizers = (
+            ('SiriusTopAnnotations', self._finalize_annotations, annotations),
+            ('SiriusFormulas', self._finalize_formulas, formulas),
+            ('SiriusClasses', self._finalize_classes, classes),
+            ('SiriusStructures', self._finalize_structures, structures),
+            ('SiriusDeNovoStructures', self._finalize_denovo, denovo))
         
-        # finalize structures
-        table = self._finalize_structures(structures)
-        results['SiriusStructures'] = table
-        
-        # finalize denovo
-        table = self._finalize_denovo(denovo)
-        results['SiriusDeNovoStructures'] = table
+        # finalize tables concurrently
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(finalizers)) as executor:
+            futures = [(key, executor.submit(finalize, items)) for key, finalize, items in finalizers]
+            results = {key: future.result() for key, future in futures}
         
         return results
     
@@ -841,24 +1064,14 @@ class Sirius(object):
     def _finalize_annotations(self, annotations):
         """Finalizes all top annotations."""
         
-        # check items
-        if not annotations:
-            return None
-        
         # finalize table
-        table = pandas.DataFrame.from_dict(annotations)
-        table['ExternalID'] = table['ExternalID'].astype('Int64')
-        table['CSIFingerIDScore'] = pandas.to_numeric(table['CSIFingerIDScore'], errors='coerce')
-        table['CSIFingerIDTanimotoSimilarity'] = pandas.to_numeric(table['CSIFingerIDTanimotoSimilarity'], errors='coerce')
-        table['CSIFingerIDConfidenceExact'] = pandas.to_numeric(table['CSIFingerIDConfidenceExact'], errors='coerce')
-        table['CSIFingerIDConfidenceApprox'] = pandas.to_numeric(table['CSIFingerIDConfidenceApprox'], errors='coerce')
+        table = pandas.DataFrame(annotations, columns=_ANNOTATION_COLUMNS)
+        table = table.astype(_ANNOTATION_DTYPES)
         
         # replace invalid numbers
-        table.replace([numpy.inf, -numpy.inf], numpy.nan, inplace=True)
-        
-        # remove fingerprints
-        if 'topFingerprint' in table:
-            table.drop(['topFingerprint'], axis=1, inplace=True)
+        floats = table.select_dtypes('floating').columns
+        values = table[floats].to_numpy()
+        table[floats] = numpy.where(numpy.isinf(values), numpy.nan, values)
         
         return table
     
@@ -866,15 +1079,17 @@ class Sirius(object):
     def _finalize_formulas(self, formulas):
         """Finalizes all SIRIUS formula predictions."""
         
-        # check items
-        if not formulas:
-            return None
+        # init table
+        table = pandas.DataFrame(formulas)
+        
+        # keep exported table fields only
+        table = table.reindex(columns=_FORMULA_COLUMNS)
+        
+        # rename table fields for CD
+        table = table.rename(columns=_FORMULA_RENAME)
         
         # finalize table
-        table = pandas.concat(formulas, ignore_index=True)
-        table['SiriusFormulaID'] = table['SiriusFormulaID'].astype('Int64')
-        table['ExternalID'] = table['ExternalID'].astype('Int64')
-        table['Rank'] = table['Rank'].astype('Int64')
+        table = table.astype(_FORMULA_DTYPES)
         
         return table
     
@@ -882,15 +1097,17 @@ class Sirius(object):
     def _finalize_classes(self, classes):
         """Finalizes all compound class predictions."""
         
-        # check items
-        if not classes:
-            return None
+        # init table
+        table = pandas.DataFrame(classes)
+        
+        # keep exported table fields only
+        table = table.reindex(columns=_CLASS_COLUMNS)
+        
+        # rename table fields for CD
+        table = table.rename(columns=_CLASS_RENAME)
         
         # finalize table
-        table = pandas.concat(classes, ignore_index=True)
-        table['SiriusFormulaID'] = table['SiriusFormulaID'].astype('Int64')
-        table['ExternalID'] = table['ExternalID'].astype('Int64')
-        table['ClassID'] = table['ClassID'].astype('Int64')
+        table = table.astype(_CLASS_DTYPES)
         
         return table
     
@@ -898,15 +1115,18 @@ class Sirius(object):
     def _finalize_structures(self, structures):
         """Finalizes all CSI:FingerID database structure predictions."""
         
-        # check items
-        if not structures:
-            return None
+        # init table
+        table = pandas.DataFrame(structures)
+        
+        # keep exported table fields only
+        db_columns = [n.upper() for n in self._config.structure_db_search_dbs]
+        table = table.reindex(columns=_STRUCTURE_COLUMNS + db_columns)
+        
+        # rename table fields for CD
+        table = table.rename(columns=_STRUCTURE_RENAME)
         
         # finalize table
-        table = pandas.concat(structures, ignore_index=True)
-        table['SiriusFormulaID'] = table['SiriusFormulaID'].astype('Int64')
-        table['ExternalID'] = table['ExternalID'].astype('Int64')
-        table['Rank'] = table['Rank'].astype('Int64')
+        table = table.astype({**_STRUCTURE_DTYPES, **dict.fromkeys(db_columns, 'object')})
         
         return table
     
@@ -914,15 +1134,18 @@ class Sirius(object):
     def _finalize_denovo(self, structures):
         """Finalizes all MSNovelist de novo structure predictions."""
         
-        # check items
-        if not structures:
-            return None
+        # init table
+        table = pandas.DataFrame(structures)
+        
+        # keep exported table fields only
+        db_columns = [n.upper() for n in self._config.structure_db_search_dbs]
+        table = table.reindex(columns=_DENOVO_COLUMNS + db_columns)
+        
+        # rename table fields for CD
+        table = table.rename(columns=_STRUCTURE_RENAME)
         
         # finalize table
-        table = pandas.concat(structures, ignore_index=True)
-        table['SiriusFormulaID'] = table['SiriusFormulaID'].astype('Int64')
-        table['ExternalID'] = table['ExternalID'].astype('Int64')
-        table['Rank'] = table['Rank'].astype('Int64')
+        table = table.astype({**_STRUCTURE_DTYPES, **dict.fromkeys(db_columns, 'object')})
         
         return table
 